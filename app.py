@@ -1,13 +1,8 @@
 import streamlit as st
-import numpy as np
-import pandas as pd
 import os
-from CoolProp.CoolProp import PropsSI
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.units import inch
-from reportlab.lib import pagesizes
+import csv
+import threading
+from math import pi, ceil, sqrt, log
 from io import BytesIO
 from datetime import datetime
 
@@ -24,199 +19,358 @@ st.markdown("Developed by **Gaurav Tomar**")
 st.markdown("---")
 
 # ==============================
-# INPUT SECTION
+# FLUID STATES
 # ==============================
 
-st.header("🔹 Hydrogen Process Inputs")
+@st.cache_resource
+def get_fluid_state(backend, fluid):
+    # Low-level CoolProp state, reused across reruns to skip string parsing.
+    # Shared by all sessions, so update + reads must happen under the lock.
+    import CoolProp
+    return CoolProp.AbstractState(backend, fluid), threading.Lock()
+
+@st.cache_data(max_entries=256)
+def get_h2_props(T, P):
+    import CoolProp
+    # Bicubic tables over HEOS: the first call in a process builds them (~4 s, and
+    # writes table files to ~/.CoolProp/Tables); later updates just interpolate
+    AS, lock = get_fluid_state("BICUBIC&HEOS", "Hydrogen")
+    with lock:
+        AS.update(CoolProp.PT_INPUTS, P, T)
+        return AS.rhomass(), AS.cpmass(), AS.viscosity(), AS.conductivity(), AS.Prandtl()
+
+@st.cache_data(max_entries=256)
+def get_water_cp(T, P):
+    import CoolProp
+    AS, lock = get_fluid_state("HEOS", "Water")
+    with lock:
+        AS.update(CoolProp.PT_INPUTS, P, T)
+        return AS.cpmass()
+
+@st.cache_data(max_entries=32)
+def h2_props_vec(T_arr, P_arr):
+    # Vector PropsSI call: one FFI round-trip for the whole sweep, returns (5, N).
+    # PropsSI uses plain HEOS, not the bicubic tables behind get_h2_props; the two
+    # agree to ~1e-5 relative, well below what the sweep plot can show.
+    import numpy as np
+    from CoolProp.CoolProp import PropsSI
+    out = PropsSI(['D','C','V','L','PRANDTL'], 'T', T_arr, 'P', P_arr, 'Hydrogen')
+    return np.asarray(out).reshape(len(T_arr), 5).T
 
-col1, col2 = st.columns(2)
+# ==============================
+# DESIGN KERNEL
+# ==============================
 
-with col1:
-    flow_hot_nm3_hr = st.number_input(
-        "Hydrogen Flow (Nm³/hr)",
-        value=750.000,
-        step=1.000,
-        format="%.3f"
-    )
-    T_hot_in_C = st.number_input(
-        "Hydrogen Inlet Temp (°C)",
-        value=80.000,
-        format="%.3f"
-    )
-    T_hot_out_C = st.number_input(
-        "Hydrogen Outlet Temp (°C)",
-        value=40.000,
-        format="%.3f"
-    )
-    P_hot_bar = st.number_input(
-        "Hydrogen Pressure (bar)",
-        value=16.000,
-        format="%.3f"
-    )
+def design_kernel(rho_h, Cp_h, mu_h, k_h, Pr_h, flow_m3s, T_hi, T_ho, T_ci, T_co,
+                  D_i, t_wall, v_tgt, passes):
+    # Pure scalar math only, so it can be compiled by numba
+    m_dot_h = rho_h * flow_m3s
+    Q = m_dot_h * Cp_h * (T_hi - T_ho)
+
+    # Tube design
+    A_single = pi * D_i**2 / 4
+    N_per_pass = int(ceil(m_dot_h / (rho_h * v_tgt * A_single)))
+    N_total = N_per_pass * passes
+    velocity = m_dot_h / (rho_h * N_per_pass * A_single)
+
+    # Heat transfer coefficients
+    Re_h = rho_h * velocity * D_i / mu_h
+    # Dittus-Boelter with Nu -> h conversion folded in
+    h_hot = (0.023 * k_h / D_i) * Re_h**0.8 * Pr_h**0.4
+
+    h_shell = 3000.0  # Simplified realistic shell-side estimate
+
+    Rf_i = 0.0001
+    Rf_o = 0.0002
+    k_tube = 16.0
+
+    # Wall, fouling and shell-side resistances don't depend on the hydrogen state
+    R_const = Rf_i + t_wall/k_tube + 1/h_shell + Rf_o
+    U = 1.0 / (1.0/h_hot + R_const)
+
+    # LMTD
+    deltaT1 = T_hi - T_co
+    deltaT2 = T_ho - T_ci
+    ratio = deltaT1/deltaT2
+    if ratio <= 0.0:
+        # numba's log returns nan here instead of raising like math.log
+        raise ValueError("LMTD undefined: temperature approaches have opposite signs")
+    LMTD = (deltaT1 - deltaT2) / log(ratio)
+
+    F = 1.0 if passes == 1 else 0.85
+    A_required = Q/(U*F*LMTD)
+
+    D_o = D_i + 2*t_wall
+    K = 0.9
+    D_shell = D_o * sqrt(N_total/(0.785*K))
+
+    return Q, m_dot_h, velocity, h_hot, U, LMTD, A_required, N_total, D_shell
+
+@st.cache_resource
+def get_design_kernel():
+    # numba is optional; fall back to the plain Python kernel when it isn't installed
+    try:
+        from numba import njit
+    except ImportError:
+        return design_kernel
+    return njit(cache=True)(design_kernel)
 
-with col2:
-    T_cold_in_C = st.number_input(
-        "Cooling Water Inlet Temp (°C)",
-        value=35.000,
-        format="%.3f"
-    )
-    T_cold_out_C = st.number_input(
-        "Cooling Water Outlet Temp (°C)",
-        value=40.000,
-        format="%.3f"
-    )
-    P_cold_bar = st.number_input(
-        "Cooling Water Pressure (bar)",
-        value=3.000,
-        format="%.3f"
+# ==============================
+# PDF DATASHEET
+# ==============================
+
+@st.cache_resource
+def get_pdf_styles():
+    # Stylesheet and table style are read-only, so one instance serves every datasheet
+    from reportlab.platypus import TableStyle
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+
+    table_style = TableStyle([
+        ('BACKGROUND',(0,0),(-1,0),colors.grey),
+        ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
+        ('GRID',(0,0),(-1,-1),0.5,colors.black)
+    ])
+
+    return getSampleStyleSheet(), table_style
+
+@st.cache_data(max_entries=32)
+def build_datasheet_pdf(flow_hot_nm3_hr, Q, m_dot_cold, U, A_required, N_total, D_shell):
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table
+    from reportlab.lib.units import inch
+    from reportlab.lib import pagesizes
+
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=pagesizes.A4)
+    elements = []
+    styles, table_style = get_pdf_styles()
+
+    elements.append(Paragraph("Hydrogen Gas Cooler Design Datasheet", styles["Heading1"]))
+    elements.append(Spacer(1, 0.3 * inch))
+
+    rows = (
+        ("Hydrogen Flow (Nm3/hr)", flow_hot_nm3_hr, "{}"),
+        ("Heat Duty (kW)", Q/1000, "{:.2f}"),
+        ("Cooling Water Flow (kg/s)", m_dot_cold, "{:.2f}"),
+        ("Overall U (W/m2-K)", U, "{:.1f}"),
+        ("Required Area (m2)", A_required, "{:.2f}"),
+        ("Total Tubes", N_total, "{}"),
+        ("Shell Diameter (m)", D_shell, "{:.2f}"),
     )
+    table_data = [["Parameter", "Value"]] + [[lbl, fmt.format(v)] for lbl, v, fmt in rows]
+
+    table = Table(table_data, colWidths=[3*inch, 2*inch])
+    table.setStyle(table_style)
+
+    elements.append(table)
+    doc.build(elements)
+
+    # One copy out of the buffer; st.cache_data needs picklable bytes, not a memoryview
+    return buffer.getvalue()
+
+# ==============================
+# INPUT SECTION
+# ==============================
+
+st.header("🔹 Hydrogen Process Inputs")
 
+# Outside the form so toggling it shows/hides the manual flow input immediately
 auto_water = st.checkbox("Auto Calculate Cooling Water Flow", True)
 
-if not auto_water:
-    m_dot_cold = st.number_input(
-        "Cooling Water Flow (kg/s)",
-        value=7.000,
+# Inputs are batched in a form: editing a field doesn't rerun the script until submit
+with st.form("cooler_inputs"):
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        flow_hot_nm3_hr = st.number_input(
+            "Hydrogen Flow (Nm³/hr)",
+            value=750.000,
+            step=1.000,
+            format="%.3f"
+        )
+        T_hot_in_C = st.number_input(
+            "Hydrogen Inlet Temp (°C)",
+            value=80.000,
+            format="%.3f"
+        )
+        T_hot_out_C = st.number_input(
+            "Hydrogen Outlet Temp (°C)",
+            value=40.000,
+            format="%.3f"
+        )
+        P_hot_bar = st.number_input(
+            "Hydrogen Pressure (bar)",
+            value=16.000,
+            format="%.3f"
+        )
+
+    with col2:
+        T_cold_in_C = st.number_input(
+            "Cooling Water Inlet Temp (°C)",
+            value=35.000,
+            format="%.3f"
+        )
+        T_cold_out_C = st.number_input(
+            "Cooling Water Outlet Temp (°C)",
+            value=40.000,
+            format="%.3f"
+        )
+        P_cold_bar = st.number_input(
+            "Cooling Water Pressure (bar)",
+            value=3.000,
+            format="%.3f"
+        )
+
+    if not auto_water:
+        m_dot_cold = st.number_input(
+            "Cooling Water Flow (kg/s)",
+            value=7.000,
+            format="%.3f"
+        )
+
+    st.header("🔹 Mechanical Inputs")
+
+    D_i = st.number_input(
+        "Tube Inner Diameter (m)",
+        value=0.025,
+        step=0.001,
         format="%.3f"
     )
 
-st.header("🔹 Mechanical Inputs")
-
-D_i = st.number_input(
-    "Tube Inner Diameter (m)",
-    value=0.025,
-    step=0.001,
-    format="%.3f"
-)
+    t_wall = st.number_input(
+        "Tube Wall Thickness (m)",
+        value=0.0020,
+        step=0.0001,
+        format="%.4f"
+    )
 
-t_wall = st.number_input(
-    "Tube Wall Thickness (m)",
-    value=0.0020,
-    step=0.0001,
-    format="%.4f"
-)
+    velocity_target = st.number_input(
+        "Design Tube Velocity (m/s)",
+        value=9.000,
+        format="%.3f"
+    )
 
-velocity_target = st.number_input(
-    "Design Tube Velocity (m/s)",
-    value=9.000,
-    format="%.3f"
-)
+    passes = st.selectbox("Number of Tube Passes", [1, 2, 4])
 
-passes = st.selectbox("Number of Tube Passes", [1, 2, 4])
+    run_design = st.form_submit_button("Run Hydrogen Cooler Design")
 
 # ==============================
 # CALCULATION SECTION
 # ==============================
 
-if st.button("Run Hydrogen Cooler Design"):
+# Re-submitting unchanged inputs reuses the stored results
+design_key = (
+    flow_hot_nm3_hr, T_hot_in_C, T_hot_out_C, P_hot_bar,
+    T_cold_in_C, T_cold_out_C, P_cold_bar,
+    auto_water, None if auto_water else m_dot_cold,
+    D_i, t_wall, velocity_target, passes
+)
+
+if run_design and st.session_state.get("last_key") != design_key:
 
     try:
 
-        # Unit conversion
-        T_hot_in = T_hot_in_C + 273.15
-        T_hot_out = T_hot_out_C + 273.15
-        T_cold_in = T_cold_in_C + 273.15
-        T_cold_out = T_cold_out_C + 273.15
+        # Unit conversion (native floats into CoolProp)
+        T_hot_in = float(T_hot_in_C) + 273.15
+        T_hot_out = float(T_hot_out_C) + 273.15
+        T_cold_in = float(T_cold_in_C) + 273.15
+        T_cold_out = float(T_cold_out_C) + 273.15
 
-        P_hot = P_hot_bar * 1e5
-        P_cold = P_cold_bar * 1e5
+        P_hot = float(P_hot_bar) * 1e5
+        P_cold = float(P_cold_bar) * 1e5
         flow_hot_m3_s = flow_hot_nm3_hr / 3600
 
         # Hydrogen properties
-        rho_h = PropsSI('D','T',T_hot_in,'P',P_hot,'Hydrogen')
-        Cp_h = PropsSI('C','T',T_hot_in,'P',P_hot,'Hydrogen')
-        mu_h = PropsSI('V','T',T_hot_in,'P',P_hot,'Hydrogen')
-        k_h = PropsSI('L','T',T_hot_in,'P',P_hot,'Hydrogen')
-        Pr_h = PropsSI('PRANDTL','T',T_hot_in,'P',P_hot,'Hydrogen')
+        rho_h, Cp_h, mu_h, k_h, Pr_h = get_h2_props(T_hot_in, P_hot)
 
-        m_dot_h = rho_h * flow_hot_m3_s
-        Q = m_dot_h * Cp_h * (T_hot_in - T_hot_out)
+        Q, m_dot_h, velocity, h_hot, U, LMTD, A_required, N_total, D_shell = get_design_kernel()(
+            rho_h, Cp_h, mu_h, k_h, Pr_h, flow_hot_m3_s,
+            T_hot_in, T_hot_out, T_cold_in, T_cold_out,
+            float(D_i), float(t_wall), float(velocity_target), int(passes)
+        )
 
         # Auto water calculation
         if auto_water:
-            Cp_water = PropsSI('C','T',T_cold_in,'P',P_cold,'Water')
+            Cp_water = get_water_cp(T_cold_in, P_cold)
             m_dot_cold = Q / (Cp_water * (T_cold_out - T_cold_in))
 
-        # Tube design
-        A_single = np.pi * D_i**2 / 4
-        N_per_pass = int(np.ceil(m_dot_h / (rho_h * velocity_target * A_single)))
-        N_total = N_per_pass * passes
-        velocity = m_dot_h / (rho_h * N_per_pass * A_single)
-
-        # Heat transfer coefficients
-        Re_h = rho_h * velocity * D_i / mu_h
-        Nu_h = 0.023 * Re_h**0.8 * Pr_h**0.4
-        h_hot = Nu_h * k_h / D_i
-
-        h_shell = 3000  # Simplified realistic shell-side estimate
-
-        Rf_i = 0.0001
-        Rf_o = 0.0002
-        k_tube = 16
-
-        U = 1 / (1/h_hot + Rf_i + t_wall/k_tube + 1/h_shell + Rf_o)
-
-        # LMTD
-        deltaT1 = T_hot_in - T_cold_out
-        deltaT2 = T_hot_out - T_cold_in
-        LMTD = (deltaT1 - deltaT2) / np.log(deltaT1/deltaT2)
-
-        F = 1 if passes == 1 else 0.85
-        A_required = Q/(U*F*LMTD)
-
-        D_o = D_i + 2*t_wall
-        K = 0.9
-        D_shell = D_o * np.sqrt(N_total/(0.785*K))
-
-        # ==============================
-        # DISPLAY RESULTS
-        # ==============================
-
-        st.header("📊 Design Results")
-
-        st.write(f"Heat Duty: **{Q/1000:.2f} kW**")
-        st.write(f"Cooling Water Flow: **{m_dot_cold:.2f} kg/s**")
-        st.write(f"Overall U: **{U:.1f} W/m²-K**")
-        st.write(f"Required Area: **{A_required:.2f} m²**")
-        st.write(f"Total Tubes: **{N_total}**")
-        st.write(f"Shell Diameter: **{D_shell:.2f} m**")
-        st.write(f"Tube Velocity: **{velocity:.2f} m/s**")
-
-        # ==============================
-        # PDF GENERATION
-        # ==============================
-
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=pagesizes.A4)
-        elements = []
-        styles = getSampleStyleSheet()
-
-        elements.append(Paragraph("Hydrogen Gas Cooler Design Datasheet", styles["Heading1"]))
-        elements.append(Spacer(1, 0.3 * inch))
-
-        table_data = [
-            ["Parameter", "Value"],
-            ["Hydrogen Flow (Nm3/hr)", flow_hot_nm3_hr],
-            ["Heat Duty (kW)", f"{Q/1000:.2f}"],
-            ["Cooling Water Flow (kg/s)", f"{m_dot_cold:.2f}"],
-            ["Overall U (W/m2-K)", f"{U:.1f}"],
-            ["Required Area (m2)", f"{A_required:.2f}"],
-            ["Total Tubes", N_total],
-            ["Shell Diameter (m)", f"{D_shell:.2f}"],
-        ]
-
-        table = Table(table_data, colWidths=[3*inch, 2*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND',(0,0),(-1,0),colors.grey),
-            ('TEXTCOLOR',(0,0),(-1,0),colors.whitesmoke),
-            ('GRID',(0,0),(-1,-1),0.5,colors.black)
-        ]))
-
-        elements.append(table)
-        doc.build(elements)
-
-        pdf = buffer.getvalue()
-        buffer.close()
+        st.session_state["results"] = {
+            "flow_hot_nm3_hr": flow_hot_nm3_hr,
+            "T_hot_in_C": T_hot_in_C,
+            "T_hot_out_C": T_hot_out_C,
+            "P_hot": P_hot,
+            "D_i": D_i,
+            "h_hot": h_hot,
+            "Q": Q,
+            "m_dot_cold": m_dot_cold,
+            "U": U,
+            "A_required": A_required,
+            "N_total": N_total,
+            "D_shell": D_shell,
+            "velocity": velocity,
+        }
+        st.session_state["last_key"] = design_key
+
+    except Exception as e:
+        st.session_state.pop("results", None)
+        st.session_state.pop("last_key", None)
+        st.error("Calculation Error")
+        st.write(e)
+
+# ==============================
+# DISPLAY RESULTS
+# ==============================
+
+if "results" in st.session_state:
+
+    r = st.session_state["results"]
+
+    st.header("📊 Design Results")
+
+    st.markdown("\n\n".join([
+        f"Heat Duty: **{r['Q']/1000:.2f} kW**",
+        f"Cooling Water Flow: **{r['m_dot_cold']:.2f} kg/s**",
+        f"Overall U: **{r['U']:.1f} W/m²-K**",
+        f"Required Area: **{r['A_required']:.2f} m²**",
+        f"Total Tubes: **{r['N_total']}**",
+        f"Shell Diameter: **{r['D_shell']:.2f} m**",
+        f"Tube Velocity: **{r['velocity']:.2f} m/s**",
+    ]))
+
+    if st.checkbox("Show Hydrogen Inlet Temperature Sweep"):
+        import numpy as np
+        import pandas as pd
+
+        T_sweep_C = np.linspace(
+            max(r["T_hot_out_C"] + 1, r["T_hot_in_C"] - 20), r["T_hot_in_C"] + 20, 41
+        )
+        T_sweep = T_sweep_C + 273.15
+        rho_s, Cp_s, mu_s, k_s, Pr_s = h2_props_vec(T_sweep, np.full_like(T_sweep, r["P_hot"]))
+
+        Q_sweep = rho_s * r["flow_hot_nm3_hr"] / 3600 * Cp_s * (T_sweep_C - r["T_hot_out_C"])
+
+        # Tube count is fixed by the design, so tube velocity doesn't change with density;
+        # wall, fouling and shell-side resistances are recovered from the design point
+        D_i_s = r["D_i"]
+        Re_s = rho_s * r["velocity"] * D_i_s / mu_s
+        h_hot_s = (0.023 * k_s / D_i_s) * Re_s**0.8 * Pr_s**0.4
+        R_const = 1.0/r["U"] - 1.0/r["h_hot"]
+        U_s = 1.0 / (1.0/h_hot_s + R_const)
+
+        index = pd.Index(T_sweep_C, name="Hydrogen Inlet Temp (°C)")
+        st.line_chart(pd.DataFrame({"Heat Duty (kW)": Q_sweep / 1000}, index=index))
+        st.line_chart(pd.DataFrame(
+            {"Tube-side h (W/m²-K)": h_hot_s, "Overall U (W/m²-K)": U_s},
+            index=index
+        ))
+
+    # Datasheet is only built when asked for
+    if st.button("Generate Design Datasheet (PDF)"):
+        pdf = build_datasheet_pdf(
+            r["flow_hot_nm3_hr"], r["Q"], r["m_dot_cold"], r["U"],
+            r["A_required"], r["N_total"], r["D_shell"]
+        )
 
         st.download_button(
             "📥 Download Design Datasheet (PDF)",
@@ -225,10 +379,6 @@ if st.button("Run Hydrogen Cooler Design"):
             "application/pdf"
         )
 
-    except Exception as e:
-        st.error("Calculation Error")
-        st.write(e)
-
 # ==============================
 # FEEDBACK SECTION
 # ==============================
@@ -254,28 +404,28 @@ st.markdown(
     unsafe_allow_html=True
 )
 
+@st.cache_data(ttl=60)
+def load_feedback(mtime):
+    # mtime is only the cache key: a new submission invalidates the cached table
+    import pandas as pd
+    return pd.read_csv("feedback.csv")
+
 name = st.text_input("Your Name")
 feedback_text = st.text_area("Your Feedback")
 
 if st.button("Submit Feedback"):
     if name and feedback_text:
-        feedback_data = {
-            "Timestamp": datetime.now(),
-            "Name": name,
-            "Feedback": feedback_text
-        }
-
         file_exists = os.path.isfile("feedback.csv")
-        df = pd.DataFrame([feedback_data])
 
-        if file_exists:
-            df.to_csv("feedback.csv", mode='a', header=False, index=False)
-        else:
-            df.to_csv("feedback.csv", index=False)
+        with open("feedback.csv", "a", newline="") as f:
+            writer = csv.writer(f)
+            if not file_exists:
+                writer.writerow(["Timestamp", "Name", "Feedback"])
+            writer.writerow([datetime.now(), name, feedback_text])
 
         st.success("Thank you for your feedback!")
 
 if os.path.isfile("feedback.csv"):
     st.subheader("📢 Visitor Feedback")
-    feedback_df = pd.read_csv("feedback.csv")
+    feedback_df = load_feedback(os.path.getmtime("feedback.csv"))
     st.dataframe(feedback_df)
\ No newline at end of file